@@ -15,8 +15,11 @@ Notes:
 from __future__ import annotations
 
 import argparse
+import os
+import socket
 import struct
 import sys
+from array import array
 from dataclasses import dataclass
 from typing import Optional, Tuple
 
@@ -34,19 +37,42 @@ PTP_CT_RESPONSE = 0x0003
 
 PTP_OC_GET_DEVICE_INFO = 0x1001
 
+# Precompiled formats: skips the per-call format-string parse.
+_PTP_HDR = struct.Struct("<IHHI")
+_LE16 = struct.Struct("<H")
+_LE32 = struct.Struct("<I")
+
 
 def hexdump(buf: bytes, prefix: str = "") -> None:
-    for off in range(0, len(buf), 16):
-        chunk = buf[off : off + 16]
-        print(f"{prefix}{off:04x}: " + " ".join(f"{b:02x}" for b in chunk))
+    # bytes.hex(" ") formats each row in C; emit the whole dump with one
+    # write instead of a print (= syscall) per 16-byte line.
+    out = "\n".join(
+        f"{prefix}{off:04x}: " + buf[off : off + 16].hex(" ")
+        for off in range(0, len(buf), 16)
+    )
+    if out:
+        sys.stdout.write(out + "\n")
 
 
 def le16(b: bytes, off: int) -> int:
-    return struct.unpack_from("<H", b, off)[0]
+    return _LE16.unpack_from(b, off)[0]
 
 
 def le32(b: bytes, off: int) -> int:
-    return struct.unpack_from("<I", b, off)[0]
+    return _LE32.unpack_from(b, off)[0]
+
+
+# Reusable bulk IN scratch buffer; ep_in.read(buffer, ...) fills it in place.
+_rx_scratch = array("B", bytes(65536))
+
+
+def _bulk_chunk_size(ep_in) -> int:
+    # A URB sized as a whole number of wMaxPacketSize packets keeps libusb
+    # from padding the request with a trailing short packet.
+    mps = int(ep_in.wMaxPacketSize)
+    if mps <= 0:
+        return 65536
+    return max(mps, (65536 // mps) * mps)
 
 
 def read_ptp_container(ep_in, timeout_ms: int = 5000) -> bytes:
@@ -54,16 +80,35 @@ def read_ptp_container(ep_in, timeout_ms: int = 5000) -> bytes:
     Read one PTP container from bulk IN.
     Container format: <len32><type16><code16><tid32> + payload...
     """
-    first = ep_in.read(ep_in.wMaxPacketSize, timeout=timeout_ms).tobytes()
-    if len(first) < 12:
-        raise RuntimeError(f"Short read ({len(first)} bytes), expected >= 12")
-    total_len = le32(first, 0)
+    # Large reads let libusb submit one URB covering many USB packets instead
+    # of one Python round trip per wMaxPacketSize packet. Reading into a
+    # reusable scratch buffer avoids a fresh array + .tobytes() copy per read.
+    global _rx_scratch
+    chunk = _bulk_chunk_size(ep_in)
+    if len(_rx_scratch) < chunk:
+        _rx_scratch = array("B", bytes(chunk))
+    scratch = _rx_scratch
+    scratch_mv = memoryview(scratch)
+    read = ep_in.read  # hoist the descriptor-walking attribute lookup out of the loop
+    n = read(scratch, timeout=timeout_ms)
+    if n < 12:
+        raise RuntimeError(f"Short read ({n} bytes), expected >= 12")
+    total_len = le32(scratch, 0)
     if total_len < 12:
         raise RuntimeError(f"Invalid container length={total_len}")
-    buf = bytearray(first)
-    while len(buf) < total_len:
-        buf += ep_in.read(ep_in.wMaxPacketSize, timeout=timeout_ms).tobytes()
-    return bytes(buf[:total_len])
+    if total_len <= n:
+        # Single-read container (e.g. a 12-byte RESPONSE): skip the assembly buffer.
+        return bytes(scratch_mv[:total_len])
+    buf = bytearray(total_len)
+    mv = memoryview(buf)
+    pos = min(n, total_len)
+    mv[:pos] = scratch_mv[:pos]
+    while pos < total_len:
+        n = read(scratch, timeout=timeout_ms)
+        take = min(n, total_len - pos)
+        mv[pos : pos + take] = scratch_mv[:take]
+        pos += take
+    return bytes(buf)
 
 
 @dataclass
@@ -73,30 +118,44 @@ class PtpIface:
     intf_num: int
 
 
+def _is_ptp_device(dev: usb.core.Device) -> bool:
+    try:
+        return any(
+            intf.bInterfaceClass == PTP_CLASS
+            and intf.bInterfaceSubClass == PTP_SUBCLASS
+            and intf.bInterfaceProtocol == PTP_PROTOCOL
+            for cfg in dev
+            for intf in cfg
+        )
+    except usb.core.USBError:
+        # Some devices error during iteration unless privileged; skip them.
+        return False
+
+
 def find_ptp_interface(
     vid: Optional[int] = None,
     pid: Optional[int] = None,
     pick: int = 0,
 ) -> PtpIface:
-    matches: list[PtpIface] = []
-    for dev in usb.core.find(find_all=True):
-        if vid is not None and int(dev.idVendor) != vid:
-            continue
-        if pid is not None and int(dev.idProduct) != pid:
-            continue
+    # Let pyusb filter VID/PID at the descriptor-cache level and match PTP
+    # devices in a single pass, instead of walking every config/interface of
+    # every device on the bus ourselves.
+    kwargs = {}
+    if vid is not None:
+        kwargs["idVendor"] = vid
+    if pid is not None:
+        kwargs["idProduct"] = pid
 
-        try:
-            for cfg in dev:
-                for intf in cfg:
-                    if (
-                        intf.bInterfaceClass == PTP_CLASS
-                        and intf.bInterfaceSubClass == PTP_SUBCLASS
-                        and intf.bInterfaceProtocol == PTP_PROTOCOL
-                    ):
-                        matches.append(PtpIface(dev=dev, cfg_value=cfg.bConfigurationValue, intf_num=intf.bInterfaceNumber))
-        except usb.core.USBError:
-            # Some devices error during iteration unless privileged; ignore until selected.
-            continue
+    matches: list[PtpIface] = []
+    for dev in usb.core.find(find_all=True, custom_match=_is_ptp_device, **kwargs):
+        for cfg in dev:
+            for intf in cfg:
+                if (
+                    intf.bInterfaceClass == PTP_CLASS
+                    and intf.bInterfaceSubClass == PTP_SUBCLASS
+                    and intf.bInterfaceProtocol == PTP_PROTOCOL
+                ):
+                    matches.append(PtpIface(dev=dev, cfg_value=cfg.bConfigurationValue, intf_num=intf.bInterfaceNumber))
 
     if not matches:
         raise RuntimeError("No USB Still Image (PTP) interfaces found.")
@@ -141,32 +200,105 @@ def claim_interface(dev: usb.core.Device, cfg_value: int, intf_num: int) -> Tupl
 
 
 def ptp_get_device_info(ep_in, ep_out, tid: int = 1) -> Tuple[bytes, bytes]:
-    cmd = struct.pack("<IHHI", 12, PTP_CT_COMMAND, PTP_OC_GET_DEVICE_INFO, tid)
+    cmd = _PTP_HDR.pack(_PTP_HDR.size, PTP_CT_COMMAND, PTP_OC_GET_DEVICE_INFO, tid)
     ep_out.write(cmd, timeout=5000)
     data = read_ptp_container(ep_in, timeout_ms=5000)
     resp = read_ptp_container(ep_in, timeout_ms=5000)
     return data, resp
 
 
+class PtpSession:
+    """
+    A claimed PTP interface that can serve repeated operations.
+
+    Each plain invocation of this script pays the full set_configuration +
+    kernel-driver detach + claim cost (hundreds of ms on some setups). Keeping
+    the session open in --daemon mode makes repeated requests free of that
+    startup latency.
+    """
+
+    def __init__(self, vid: Optional[int] = None, pid: Optional[int] = None, pick: int = 0):
+        self.iface = find_ptp_interface(vid=vid, pid=pid, pick=pick)
+        self.dev = self.iface.dev
+        self.ep_in, self.ep_out = claim_interface(self.dev, self.iface.cfg_value, self.iface.intf_num)
+        self._tid = 0
+
+    def _next_tid(self) -> int:
+        self._tid += 1
+        return self._tid
+
+    def get_device_info(self) -> Tuple[bytes, bytes]:
+        return ptp_get_device_info(self.ep_in, self.ep_out, tid=self._next_tid())
+
+    def close(self) -> None:
+        try:
+            usb.util.release_interface(self.dev, self.iface.intf_num)
+        except Exception:
+            pass
+        try:
+            usb.util.dispose_resources(self.dev)
+        except Exception:
+            pass
+
+    def serve(self, unix_path: str) -> None:
+        """
+        Serve requests over a unix socket with the interface kept claimed.
+        Request: uint16le opcode. Reply: uint32le len + DATA container,
+        uint32le len + RESPONSE container (len=0,len=0 for unsupported ops).
+        """
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        srv.bind(unix_path)
+        srv.listen(1)
+        print(f"Serving PTP session on {unix_path} (Ctrl-C to stop)")
+        try:
+            while True:
+                conn, _ = srv.accept()
+                with conn:
+                    req = conn.recv(2)
+                    if len(req) < 2:
+                        continue
+                    (opcode,) = _LE16.unpack(req)
+                    if opcode != PTP_OC_GET_DEVICE_INFO:
+                        conn.sendall(_LE32.pack(0) + _LE32.pack(0))
+                        continue
+                    data, resp = self.get_device_info()
+                    conn.sendall(_LE32.pack(len(data)) + data + _LE32.pack(len(resp)) + resp)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            srv.close()
+            try:
+                os.unlink(unix_path)
+            except OSError:
+                pass
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Send PTP GetDeviceInfo over USB and print raw dataset hex.")
     ap.add_argument("--vid", type=lambda s: int(s, 0), default=None, help="USB VID (e.g. 0x054c)")
     ap.add_argument("--pid", type=lambda s: int(s, 0), default=None, help="USB PID (e.g. 0x0d9f)")
     ap.add_argument("--pick", type=int, default=0, help="Pick Nth matching PTP interface (default: 0)")
     ap.add_argument("--dump-container", action="store_true", help="Also dump full DATA/RESP containers (incl headers)")
+    ap.add_argument("--daemon", metavar="UNIX_PATH", default=None,
+                    help="Keep the interface claimed and serve requests over this unix socket")
     args = ap.parse_args()
 
-    ptp = find_ptp_interface(vid=args.vid, pid=args.pid, pick=args.pick)
-    d = ptp.dev
+    session = PtpSession(vid=args.vid, pid=args.pid, pick=args.pick)
+    d = session.dev
+    ptp = session.iface
     print(f"Using VID=0x{int(d.idVendor):04x} PID=0x{int(d.idProduct):04x} cfg={ptp.cfg_value} if={ptp.intf_num}")
 
-    ep_in = ep_out = None
     try:
-        ep_in, ep_out = claim_interface(d, ptp.cfg_value, ptp.intf_num)
-        data, resp = ptp_get_device_info(ep_in, ep_out, tid=1)
+        if args.daemon:
+            session.serve(args.daemon)
+            return 0
+
+        data, resp = session.get_device_info()
 
-        dlen, dtype, dop, dtid = struct.unpack_from("<IHHI", data, 0)
-        rlen, rtype, rcode, rtid = struct.unpack_from("<IHHI", resp, 0)
+        dlen, dtype, dop, dtid = _PTP_HDR.unpack_from(data, 0)
+        rlen, rtype, rcode, rtid = _PTP_HDR.unpack_from(resp, 0)
         print(f"DATA: len={dlen} type=0x{dtype:04x} code=0x{dop:04x} tid={dtid}")
         print(f"RESP: len={rlen} type=0x{rtype:04x} code=0x{rcode:04x} tid={rtid}")
 
@@ -181,15 +313,7 @@ def main() -> int:
         hexdump(dataset)
 
     finally:
-        try:
-            if ep_in is not None:
-                usb.util.release_interface(d, ptp.intf_num)
-        except Exception:
-            pass
-        try:
-            usb.util.dispose_resources(d)
-        except Exception:
-            pass
+        session.close()
 
     return 0
 
@@ -22,21 +22,38 @@ Notes:
 from __future__ import annotations
 
 import argparse
+import os
+import queue
+import selectors
 import socket
 import struct
 import sys
+import threading
 import time
+from collections import deque
+from array import array
 from dataclasses import dataclass
 from typing import Optional, Tuple
 
 import usb.core
 import usb.util
 
+try:
+    import usb1  # python-libusb1, optional: enables the async bulk IN path
+except ImportError:
+    usb1 = None
+
 
 # Proxy framing: uint32_be length (type+payload), uint8 type, payload...
 T_CMD_STD = 0x01
 T_CONT_STD = 0x02
 
+# Precompiled hot-path formats: skips the per-call format-string parse.
+_FRAME_HDR = struct.Struct(">IB")
+_FRAME_LEN = struct.Struct(">I")
+_PTP_HDR = struct.Struct("<IHHI")
+_PTP_LEN = struct.Struct("<I")
+
 
 # PTP constants
 PTP_CLASS, PTP_SUBCLASS, PTP_PROTOCOL = 0x06, 0x01, 0x01
@@ -44,57 +61,354 @@ PTP_CT_COMMAND, PTP_CT_DATA, PTP_CT_RESPONSE = 1, 2, 3
 
 
 def hexdump(buf: bytes, prefix: str = "") -> str:
-    lines = []
-    for off in range(0, len(buf), 16):
-        chunk = buf[off : off + 16]
-        lines.append(f"{prefix}{off:04x}: " + " ".join(f"{b:02x}" for b in chunk))
-    return "\n".join(lines)
-
-
-def recv_exact(sock: socket.socket, n: int) -> bytes:
-    buf = bytearray()
-    while len(buf) < n:
-        chunk = sock.recv(n - len(buf))
-        if not chunk:
-            raise EOFError("socket closed")
-        buf += chunk
-    return bytes(buf)
+    # bytes.hex(" ") formats a whole row in C; only the row framing stays in Python.
+    return "\n".join(
+        f"{prefix}{off:04x}: " + buf[off : off + 16].hex(" ")
+        for off in range(0, len(buf), 16)
+    )
+
 
+# Preallocated frame receive buffer: recv_into fills it in place, so no
+# per-fragment copy or bytearray resize happens while a frame arrives.
+_recv_buf = bytearray(1 << 20)
 
-def recv_frame(sock: socket.socket) -> Tuple[int, bytes]:
-    hdr = recv_exact(sock, 5)
-    length = struct.unpack(">I", hdr[:4])[0]
-    ftype = hdr[4]
+
+def _recv_into_exact(sock: socket.socket, mv: memoryview) -> None:
+    got = 0
+    n = len(mv)
+    while got < n:
+        r = sock.recv_into(mv[got:], n - got)
+        if not r:
+            raise EOFError("socket closed")
+        got += r
+
+
+def recv_frame(sock: socket.socket) -> Tuple[int, memoryview]:
+    """
+    Receive one frame into the shared buffer and return (type, payload view).
+    The view is only valid until the next recv_frame call.
+    """
+    global _recv_buf
+    mv = memoryview(_recv_buf)
+    _recv_into_exact(sock, mv[:5])
+    length = _FRAME_LEN.unpack_from(_recv_buf, 0)[0]
+    ftype = _recv_buf[4]
     if length == 0:
         raise ValueError("invalid frame length=0")
     payload_len = length - 1
-    payload = recv_exact(sock, payload_len) if payload_len else b""
-    return ftype, payload
+    if 5 + payload_len > len(_recv_buf):
+        _recv_buf = bytearray(5 + payload_len)
+        mv = memoryview(_recv_buf)
+    if payload_len:
+        _recv_into_exact(sock, mv[5 : 5 + payload_len])
+    return ftype, mv[5 : 5 + payload_len]
+
+
+# Reused framing header so send_frame never concatenates header + payload
+# into a fresh bytes object (the payload is often the largest buffer around).
+_send_hdr = bytearray(5)
 
 
 def send_frame(sock: socket.socket, ftype: int, payload: bytes) -> None:
-    length = 1 + len(payload)
-    sock.sendall(struct.pack(">IB", length, ftype) + payload)
+    _FRAME_HDR.pack_into(_send_hdr, 0, 1 + len(payload), ftype)
+    # Scatter-send: the kernel gathers header + payload, no Python-level copy.
+    total = 5 + len(payload)
+    sent = sock.sendmsg([_send_hdr, payload])
+    if sent != total:
+        # Rare partial send (send buffer full): finish with sendall.
+        rest = bytes(_send_hdr) + bytes(payload)
+        sock.sendall(rest[sent:])
+
+
+# sendmsg rejects gathers beyond IOV_MAX buffers (1024 on Linux) with
+# EMSGSIZE, so oversized batches must go out in slices.
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+    if _IOV_MAX <= 0:
+        _IOV_MAX = 1024
+except (AttributeError, OSError, ValueError):
+    _IOV_MAX = 1024
+
+
+def send_buffers(sock: socket.socket, bufs) -> None:
+    """Send a list of buffers with gathered sendmsg calls (sendall fallback)."""
+    for start in range(0, len(bufs), _IOV_MAX):
+        group = bufs[start : start + _IOV_MAX]
+        total = sum(len(b) for b in group)
+        sent = sock.sendmsg(group)
+        if sent != total:
+            rest = b"".join(bytes(b) for b in group)
+            sock.sendall(rest[sent:])
+
+
+def send_container_frames(sock: socket.socket, total_len: int, chunks) -> None:
+    """Frame one PTP container (already split into USB chunks) and send it."""
+    if len(chunks) == 1:
+        send_frame(sock, T_CONT_STD, chunks[0])
+        return
+    _FRAME_HDR.pack_into(_send_hdr, 0, 1 + total_len, T_CONT_STD)
+    sent = sock.sendmsg([_send_hdr, chunks[0]])
+    if sent != 5 + len(chunks[0]):
+        rest = bytes(_send_hdr) + bytes(chunks[0])
+        sock.sendall(rest[sent:])
+    for c in chunks[1:]:
+        sock.sendall(c)
+
+
+def tune_socket(sock: socket.socket) -> None:
+    """
+    Disable Nagle and enlarge the kernel socket buffers: the PTP stream is
+    request/response with small command frames and large DATA containers, so
+    default coalescing adds delayed-ACK latency per command and the default
+    buffers cap throughput. Note: on Linux the 4 MiB buffers only take full
+    effect if net.core.rmem_max / wmem_max are raised accordingly.
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    except OSError:
+        pass
+
+
+def quickack(sock: socket.socket) -> None:
+    # Linux-only: suppress delayed ACKs on the next received segments.
+    # Must be re-armed after each receive.
+    if hasattr(socket, "TCP_QUICKACK"):
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        except OSError:
+            pass
+
+
+class UringSocket:
+    """
+    io_uring-backed drop-in for the proxy TCP socket (Linux, optional).
+
+    Per-container recv/send here are small and frequent, which is the regime
+    where submission batching beats the classic syscall-per-op socket path.
+    Only the methods the proxy uses (recv_into / sendall / sendmsg) go through
+    the ring; everything else delegates to the wrapped socket. Requires the
+    `liburing` Python binding; callers fall back to the plain socket if ring
+    setup fails.
+    """
+
+    def __init__(self, sock: socket.socket, entries: int = 32):
+        import liburing
+
+        self._lu = liburing
+        self._sock = sock
+        self._fd = sock.fileno()
+        self._ring = liburing.io_uring()
+        flags = 0
+        for name in ("IORING_SETUP_SINGLE_ISSUER", "IORING_SETUP_DEFER_TASKRUN"):
+            flags |= getattr(liburing, name, 0)
+        try:
+            liburing.io_uring_queue_init(entries, self._ring, flags)
+        except OSError:
+            # Older kernels reject the newer setup flags; plain ring still wins.
+            liburing.io_uring_queue_init(entries, self._ring, 0)
+
+    def _complete(self) -> int:
+        lu = self._lu
+        cqe = lu.io_uring_cqe()
+        lu.io_uring_wait_cqe(self._ring, cqe)
+        res = cqe.res
+        lu.io_uring_cqe_seen(self._ring, cqe)
+        if res < 0:
+            raise OSError(-res, os.strerror(-res))
+        return res
+
+    def recv_into(self, buf, nbytes: int = 0) -> int:
+        lu = self._lu
+        n = nbytes or len(buf)
+        sqe = lu.io_uring_get_sqe(self._ring)
+        lu.io_uring_prep_recv(sqe, self._fd, buf, n, 0)
+        lu.io_uring_submit(self._ring)
+        return self._complete()
+
+    def _send(self, mv) -> int:
+        lu = self._lu
+        sqe = lu.io_uring_get_sqe(self._ring)
+        lu.io_uring_prep_send(sqe, self._fd, mv, len(mv), 0)
+        lu.io_uring_submit(self._ring)
+        return self._complete()
+
+    def sendall(self, data) -> None:
+        mv = memoryview(data)
+        while len(mv):
+            mv = mv[self._send(mv) :]
+
+    def sendmsg(self, buffers) -> int:
+        # Sequential sends through the ring. A linked-SQE batch cannot honor
+        # TCP partial sends: io_uring treats a short send as a chain failure
+        # (the rest completes with -ECANCELED), and an unsevered chain after
+        # a short send would put a gap in the stream. Completing each buffer
+        # — including any short-send remainder — before submitting the next
+        # keeps the byte stream exact, at one submit per buffer.
+        total = 0
+        for b in buffers:
+            mv = memoryview(b)
+            while len(mv):
+                sent = self._send(mv)
+                total += sent
+                mv = mv[sent:]
+        return total
+
+    def close(self) -> None:
+        try:
+            self._lu.io_uring_queue_exit(self._ring)
+        except Exception:
+            pass
+        self._sock.close()
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
 
 
 def parse_ptp_hdr(container: bytes) -> Tuple[int, int, int, int]:
-    if len(container) < 12:
+    if len(container) < _PTP_HDR.size:
         raise ValueError("short container")
-    length, ctype, code, tid = struct.unpack_from("<IHHI", container, 0)
+    length, ctype, code, tid = _PTP_HDR.unpack_from(container, 0)
     return length, ctype, code, tid
 
 
-def read_container(ep_in, timeout_ms: int = 5000) -> bytes:
-    first = ep_in.read(ep_in.wMaxPacketSize, timeout=timeout_ms).tobytes()
-    if len(first) < 12:
-        raise RuntimeError(f"short read ({len(first)} bytes)")
-    total_len = struct.unpack_from("<I", first, 0)[0]
+# Reusable bulk IN scratch buffer: ep_in.read(buffer, ...) fills it in place,
+# so per-packet array allocation + .tobytes() copies disappear from the hot path.
+_rx_scratch = array("B", bytes(65536))
+
+
+def _bulk_chunk_size(ep_in) -> int:
+    # A URB sized as a whole number of wMaxPacketSize packets keeps libusb
+    # from padding the request with a trailing short packet.
+    mps = int(ep_in.wMaxPacketSize)
+    if mps <= 0:
+        return 65536
+    return max(mps, (65536 // mps) * mps)
+
+
+def iter_container_chunks(ep_in, timeout_ms: int = 5000):
+    """
+    Read one PTP container as a sequence of chunk views (first chunk always
+    holds the full 12-byte header). Lets the caller stream USB chunks straight
+    to TCP without staging the whole container in memory; each yielded view is
+    only valid until the next iteration.
+
+    Yields (chunk_memoryview, total_len).
+    """
+    global _rx_scratch
+    chunk = _bulk_chunk_size(ep_in)
+    if len(_rx_scratch) < chunk:
+        _rx_scratch = array("B", bytes(chunk))
+    scratch = _rx_scratch
+    scratch_mv = memoryview(scratch)
+    read = ep_in.read
+    n = read(scratch, timeout=timeout_ms)
+    if n < 12:
+        raise RuntimeError(f"short read ({n} bytes)")
+    total_len = _PTP_LEN.unpack_from(scratch, 0)[0]
     if total_len < 12:
         raise RuntimeError(f"invalid container length={total_len}")
-    buf = bytearray(first)
-    while len(buf) < total_len:
-        buf += ep_in.read(ep_in.wMaxPacketSize, timeout=timeout_ms).tobytes()
-    return bytes(buf[:total_len])
+    pos = min(n, total_len)
+    yield scratch_mv[:pos], total_len
+    while pos < total_len:
+        n = read(scratch, timeout=timeout_ms)
+        take = min(n, total_len - pos)
+        yield scratch_mv[:take], total_len
+        pos += take
+
+
+class AsyncCameraUsb:
+    """
+    libusb1-based camera transport with a pipelined bulk IN submission queue.
+
+    Synchronous per-packet ep_in.read() leaves the bus idle between completions;
+    keeping several async transfers submitted means the kernel always has a
+    buffer to DMA into, so the bus stays saturated between container boundaries.
+    Bulk OUT stays synchronous (commands are small).
+    """
+
+    NUM_TRANSFERS = 6
+    TRANSFER_SIZE = 16384
+
+    def __init__(self, vid: int, pid: int, intf_num: int, ep_in_addr: int, ep_out_addr: int):
+        self.ctx = usb1.USBContext()
+        self.handle = self.ctx.openByVendorIDAndProductID(vid, pid, skip_on_error=True)
+        if self.handle is None:
+            raise RuntimeError(f"cannot open VID=0x{vid:04x} PID=0x{pid:04x} via libusb1")
+        self.intf_num = intf_num
+        self.ep_in_addr = ep_in_addr
+        self.ep_out_addr = ep_out_addr
+        try:
+            self.handle.setAutoDetachKernelDriver(True)
+        except usb1.USBError:
+            pass
+        self.handle.claimInterface(intf_num)
+        self._assembly = bytearray()
+        self._containers: list = []
+        self._error: Optional[Exception] = None
+        self._transfers = []
+        for _ in range(self.NUM_TRANSFERS):
+            xfer = self.handle.getTransfer()
+            xfer.setBulk(ep_in_addr, self.TRANSFER_SIZE, callback=self._on_rx)
+            xfer.submit()
+            self._transfers.append(xfer)
+
+    def _on_rx(self, transfer) -> None:
+        status = transfer.getStatus()
+        if status == usb1.TRANSFER_COMPLETED:
+            self._assembly += transfer.getBuffer()[: transfer.getActualLength()]
+            self._pop_containers()
+            transfer.submit()
+        elif status == usb1.TRANSFER_CANCELLED:
+            pass
+        else:
+            self._error = RuntimeError(f"bulk IN transfer failed: status={status}")
+
+    def _pop_containers(self) -> None:
+        buf = self._assembly
+        while len(buf) >= 12:
+            total_len = _PTP_LEN.unpack_from(buf, 0)[0]
+            if total_len < 12:
+                self._error = RuntimeError(f"invalid container length={total_len}")
+                return
+            if len(buf) < total_len:
+                return
+            self._containers.append(bytes(buf[:total_len]))
+            del buf[:total_len]
+
+    def read_container(self, timeout_ms: int = 5000) -> bytes:
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        while True:
+            if self._containers:
+                return self._containers.pop(0)
+            if self._error is not None:
+                err, self._error = self._error, None
+                raise err
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError("camera read timeout")
+            self.ctx.handleEventsTimeout(min(remaining, 0.1))
+
+    def write(self, data: bytes, timeout: int = 5000) -> None:
+        self.handle.bulkWrite(self.ep_out_addr, bytes(data), timeout=timeout)
+
+    def close(self) -> None:
+        for xfer in self._transfers:
+            try:
+                xfer.cancel()
+            except usb1.USBError:
+                pass
+        try:
+            self.ctx.handleEventsTimeout(0.2)
+        except usb1.USBError:
+            pass
+        try:
+            self.handle.releaseInterface(self.intf_num)
+        except usb1.USBError:
+            pass
+        self.handle.close()
+        self.ctx.close()
 
 
 @dataclass
@@ -106,20 +420,33 @@ class CameraUsb:
     ep_out: object
 
 
+def _is_ptp_device(dev: usb.core.Device) -> bool:
+    try:
+        return any(
+            (intf.bInterfaceClass, intf.bInterfaceSubClass, intf.bInterfaceProtocol)
+            == (PTP_CLASS, PTP_SUBCLASS, PTP_PROTOCOL)
+            for cfg in dev
+            for intf in cfg
+        )
+    except usb.core.USBError:
+        return False
+
+
 def find_ptp_camera(vid: Optional[int], pid: Optional[int], pick: int) -> CameraUsb:
+    # VID/PID filtering happens inside pyusb at the descriptor-cache level;
+    # only devices that actually expose a PTP interface are walked here.
+    kwargs = {}
+    if vid is not None:
+        kwargs["idVendor"] = vid
+    if pid is not None:
+        kwargs["idProduct"] = pid
+
     matches = []
-    for dev in usb.core.find(find_all=True):
-        if vid is not None and int(dev.idVendor) != vid:
-            continue
-        if pid is not None and int(dev.idProduct) != pid:
-            continue
-        try:
-            for cfg in dev:
-                for intf in cfg:
-                    if (intf.bInterfaceClass, intf.bInterfaceSubClass, intf.bInterfaceProtocol) == (PTP_CLASS, PTP_SUBCLASS, PTP_PROTOCOL):
-                        matches.append((dev, cfg.bConfigurationValue, intf.bInterfaceNumber))
-        except usb.core.USBError:
-            continue
+    for dev in usb.core.find(find_all=True, custom_match=_is_ptp_device, **kwargs):
+        for cfg in dev:
+            for intf in cfg:
+                if (intf.bInterfaceClass, intf.bInterfaceSubClass, intf.bInterfaceProtocol) == (PTP_CLASS, PTP_SUBCLASS, PTP_PROTOCOL):
+                    matches.append((dev, cfg.bConfigurationValue, intf.bInterfaceNumber))
 
     if not matches:
         raise RuntimeError("No USB Still Image (PTP) camera found.")
@@ -165,30 +492,146 @@ def main() -> int:
     ap.add_argument("--pid", type=lambda s: int(s, 0), default=None, help="Camera USB PID")
     ap.add_argument("--pick", type=int, default=0, help="Pick Nth PTP interface (default: 0)")
     ap.add_argument("--log", default=None, help="Write log to this file")
+    ap.add_argument("--async-in", action="store_true",
+                    help="Use libusb1 async bulk IN transfers (pipelined submissions; needs python-libusb1).")
+    ap.add_argument("--backend", choices=["socket", "uring"], default="socket",
+                    help="TCP backend: plain sockets (default) or io_uring via liburing (Linux only).")
+    ap.add_argument("--batch-frames", action="store_true",
+                    help="Accumulate outbound frames and send once per PTP transaction (after RESPONSE). "
+                         "Fewer syscalls at slightly higher latency-to-first-byte.")
     args = ap.parse_args()
 
-    log_f = open(args.log, "a", encoding="utf-8") if args.log else None
+    log_f = open(args.log, "a", encoding="utf-8", buffering=64 * 1024) if args.log else None
+
+    # File logging (incl. hexdump formatting, a ~4x expansion of every byte)
+    # runs on a background thread so it never blocks the USB<->TCP pump. The
+    # hot path only enqueues; the writer drains in batches with one write()
+    # per batch instead of a write+flush per line.
+    log_q: "queue.SimpleQueue" = queue.SimpleQueue()
+
+    def _fmt_log_item(item: Tuple[Optional[str], Optional[bytes]]) -> str:
+        line, dump = item
+        out = ""
+        if line is not None:
+            out += line + "\n"
+        if dump is not None:
+            out += hexdump(dump, prefix="  ") + "\n"
+        return out
+
+    def _drain_logs() -> None:
+        # Flushing is time-based (~100 ms), not per write: O(packets) flush
+        # syscalls become O(time) while the file stays reasonably current.
+        assert log_f is not None
+        last_flush = time.monotonic()
+        stop = False
+        while not stop:
+            try:
+                item = log_q.get(timeout=0.1)
+            except queue.Empty:
+                item = False
+            if item is None:
+                break
+            batch = []
+            if item:
+                batch.append(_fmt_log_item(item))
+            while len(batch) < 64:
+                try:
+                    nxt = log_q.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(_fmt_log_item(nxt))
+            if batch:
+                log_f.write("".join(batch))
+            now = time.monotonic()
+            if now - last_flush >= 0.1:
+                log_f.flush()
+                last_flush = now
+        log_f.flush()
+
+    log_thread: Optional[threading.Thread] = None
+    if log_f:
+        log_thread = threading.Thread(target=_drain_logs, daemon=True)
+        log_thread.start()
 
     def log(msg: str) -> None:
         ts = time.strftime("%H:%M:%S")
         line = f"[{ts}] {msg}"
         print(line)
         if log_f:
-            log_f.write(line + "\n")
-            log_f.flush()
+            log_q.put((line, None))
+
+    def log_dump(buf) -> None:
+        # Copy: the caller's buffer (e.g. the shared recv frame view) may be
+        # reused before the writer thread formats it.
+        if log_f:
+            log_q.put((None, bytes(buf)))
 
     log("Opening camera USB interface...")
     cam = find_ptp_camera(args.vid, args.pid, args.pick)
     log(f"Camera: VID=0x{int(cam.dev.idVendor):04x} PID=0x{int(cam.dev.idProduct):04x} if={cam.intf_num}")
 
+    acam: Optional[AsyncCameraUsb] = None
+    if args.async_in:
+        if usb1 is None:
+            log("--async-in requested but python-libusb1 is not installed; using sync reads.")
+        else:
+            vid_pid = (int(cam.dev.idVendor), int(cam.dev.idProduct))
+            ep_in_addr = int(cam.ep_in.bEndpointAddress)
+            ep_out_addr = int(cam.ep_out.bEndpointAddress)
+            # Hand the claimed interface over from pyusb to libusb1.
+            usb.util.release_interface(cam.dev, cam.intf_num)
+            usb.util.dispose_resources(cam.dev)
+            acam = AsyncCameraUsb(vid_pid[0], vid_pid[1], cam.intf_num, ep_in_addr, ep_out_addr)
+            log(f"Async IN enabled: {AsyncCameraUsb.NUM_TRANSFERS} x {AsyncCameraUsb.TRANSFER_SIZE} B transfers pipelined.")
+
+    if acam is not None:
+        cam_write = acam.write
+    else:
+        cam_write = lambda data, timeout=5000: cam.ep_out.write(data, timeout=timeout)
+
     log(f"Connecting to ESP proxy {args.esp_host}:{args.esp_port} ...")
     sock = socket.create_connection((args.esp_host, args.esp_port), timeout=5)
     sock.settimeout(None)
+    tune_socket(sock)
+    if args.backend == "uring":
+        if sys.platform != "linux":
+            log("--backend uring is Linux-only; using plain sockets.")
+        else:
+            try:
+                sock = UringSocket(sock)
+                log("io_uring TCP backend enabled.")
+            except ImportError:
+                log("liburing not installed; using plain sockets.")
+            except OSError as e:
+                log(f"io_uring unavailable ({e}); using plain sockets.")
     log("Connected.")
 
+    # Overlap USB and TCP: instead of strictly alternating recv -> USB ->
+    # send, watch the ESP socket with a selector and drain any frames that
+    # arrive while the camera is still producing containers. The next command
+    # is then parsed and ready the moment the RESPONSE is forwarded, and the
+    # ESP never backs up on an unread TCP buffer.
+    sel = selectors.DefaultSelector()
+    sel.register(sock, selectors.EVENT_READ)
+    cmd_q: deque = deque()
+
+    def pull_ready_frames() -> None:
+        # Non-blocking: queue whatever the ESP has already sent. Payloads are
+        # copied out of the shared recv buffer since several can be queued.
+        while sel.select(0):
+            f, p = recv_frame(sock)
+            quickack(sock)
+            cmd_q.append((f, bytes(p)))
+
     try:
         while True:
-            ftype, payload = recv_frame(sock)
+            while not cmd_q:
+                sel.select(None)
+                pull_ready_frames()
+            ftype, payload = cmd_q.popleft()
             if ftype != T_CMD_STD:
                 log(f"Unexpected frame type=0x{ftype:02x} (len={len(payload)})")
                 continue
@@ -201,31 +644,74 @@ def main() -> int:
                 continue
 
             log(f"RS3->CAM CMD: type=0x{ctype:04x} code=0x{code:04x} tid={tid} bytes={len(cmd)}")
-            if log_f:
-                log_f.write(hexdump(cmd, prefix="  ") + "\n")
+            log_dump(cmd)
 
             # Forward to camera
-            cam.ep_out.write(cmd, timeout=5000)
+            cam_write(cmd, timeout=5000)
 
-            # Read containers until RESPONSE
-            while True:
-                cont = read_container(cam.ep_in, timeout_ms=5000)
+            # Producer/consumer split: a reader thread drains camera containers
+            # into a bounded queue while this thread frames and sends them.
+            # pyusb releases the GIL inside ep_in.read and the socket releases
+            # it inside send, so the USB read of the next container genuinely
+            # overlaps the TCP send of the current one. The bounded queue makes
+            # a slow TCP side throttle USB reads instead of growing memory.
+            rx_q: "queue.Queue" = queue.Queue(maxsize=8)
+
+            def _pump_containers() -> None:
                 try:
-                    alen, atype, acode, atid = parse_ptp_hdr(cont)
+                    while True:
+                        if acam is not None:
+                            cont = acam.read_container(timeout_ms=5000)
+                            total_len, atype, acode, atid = parse_ptp_hdr(cont)
+                            chunks = [cont]
+                        else:
+                            chunk_iter = iter_container_chunks(cam.ep_in, timeout_ms=5000)
+                            first, total_len = next(chunk_iter)
+                            _, atype, acode, atid = parse_ptp_hdr(first)
+                            # Copy each chunk out of the shared scratch buffer;
+                            # the consumer sends them without re-staging.
+                            chunks = [bytes(first)]
+                            for c, _ in chunk_iter:
+                                chunks.append(bytes(c))
+                        rx_q.put((atype, acode, atid, total_len, chunks))
+                        if atype == PTP_CT_RESPONSE:
+                            return
                 except Exception as e:
-                    log(f"Bad camera container: {e}")
+                    rx_q.put(e)
+
+            rx_thread = threading.Thread(target=_pump_containers, daemon=True)
+            rx_thread.start()
+
+            # With --batch-frames, frames are accumulated and flushed with a
+            # single gathered send once the RESPONSE closes the transaction.
+            frame_batch: Optional[list] = [] if args.batch_frames else None
+
+            while True:
+                item = rx_q.get()
+                if isinstance(item, Exception):
+                    log(f"Camera read failed: {item}")
                     break
+                atype, acode, atid, total_len, chunks = item
 
-                log(f"CAM->RS3 CONT: type=0x{atype:04x} code=0x{acode:04x} tid={atid} bytes={len(cont)}")
-                if log_f:
-                    log_f.write(hexdump(cont, prefix="  ") + "\n")
-                    log_f.flush()
+                log(f"CAM->RS3 CONT: type=0x{atype:04x} code=0x{acode:04x} tid={atid} bytes={total_len}")
+                for c in chunks:
+                    log_dump(c)
+                if frame_batch is None:
+                    send_container_frames(sock, total_len, chunks)
+                else:
+                    frame_batch.append(_FRAME_HDR.pack(1 + total_len, T_CONT_STD))
+                    frame_batch.extend(chunks)
 
-                send_frame(sock, T_CONT_STD, cont)
+                # Keep the TCP side drained while the camera is mid-transfer.
+                pull_ready_frames()
 
                 if atype == PTP_CT_RESPONSE:
                     break
 
+            if frame_batch:
+                send_buffers(sock, frame_batch)
+            rx_thread.join()
+
     except EOFError:
         log("ESP proxy disconnected.")
     finally:
@@ -233,15 +719,24 @@ def main() -> int:
             sock.close()
         except Exception:
             pass
-        try:
-            usb.util.release_interface(cam.dev, cam.intf_num)
-        except Exception:
-            pass
-        try:
-            usb.util.dispose_resources(cam.dev)
-        except Exception:
-            pass
+        if acam is not None:
+            try:
+                acam.close()
+            except Exception:
+                pass
+        else:
+            try:
+                usb.util.release_interface(cam.dev, cam.intf_num)
+            except Exception:
+                pass
+            try:
+                usb.util.dispose_resources(cam.dev)
+            except Exception:
+                pass
         if log_f:
+            log_q.put(None)
+            if log_thread is not None:
+                log_thread.join(timeout=2)
             log_f.close()
 
     return 0
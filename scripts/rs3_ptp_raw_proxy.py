@@ -27,10 +27,16 @@ Notes:
 from __future__ import annotations
 
 import argparse
+import logging
+import logging.handlers
+import queue
+import selectors
 import socket
 import struct
 import sys
 import time
+from array import array
+from functools import partial
 from typing import Optional, Tuple
 
 import usb.core
@@ -54,70 +60,152 @@ PTP_RC_SESSION_ALREADY_OPEN = 0x201E
 PTP_OC_OPEN_SESSION = 0x1002
 PTP_OC_CLOSE_SESSION = 0x1003
 
-
-def hexdump(buf: bytes, prefix: str = "") -> str:
-    lines = []
-    for off in range(0, len(buf), 16):
-        chunk = buf[off : off + 16]
-        lines.append(f"{prefix}{off:04x}: " + " ".join(f"{b:02x}" for b in chunk))
-    return "\n".join(lines)
-
-
-def recv_exact(sock: socket.socket, n: int) -> bytes:
-    buf = bytearray()
-    while len(buf) < n:
-        chunk = sock.recv(n - len(buf))
-        if not chunk:
+# Precompiled formats: skips the per-call format-string parse on the hot paths.
+_U32BE_U8 = struct.Struct(">IB")
+_HDR_LE = struct.Struct("<IHHI")
+_ALT_LE = struct.Struct("<IHIH")
+_PAD_HDR_LE = struct.Struct("<HHI")
+_LE32 = struct.Struct("<I")
+
+
+def _hexdump_rows(buf, prefix: str, base: int) -> list:
+    # One C-level bytes.hex() pass; 16-byte rows are carved out of the
+    # resulting string (3 chars per byte, 47 per row) with no per-byte Python.
+    hx = bytes(buf).hex(" ")
+    return [
+        f"{prefix}{base + off:04x}: {hx[off * 3 : off * 3 + 47]}"
+        for off in range(0, len(buf), 16)
+    ]
+
+
+def hexdump(buf, prefix: str = "", max_bytes: int = 256) -> str:
+    # Large buffers (image DATA stages can be megabytes) are truncated to a
+    # head/tail excerpt so the log path never formats the full payload;
+    # max_bytes=0 disables truncation. Offsets stay relative to the buffer.
+    n = len(buf)
+    if not max_bytes or n <= max_bytes:
+        return "\n".join(_hexdump_rows(buf, prefix, 0))
+    mv = memoryview(buf)
+    head = max(16, (max_bytes // 2) & ~15)
+    # Clamp the tail to start at or after the head: with a small max_bytes
+    # (< 32) and a buffer barely longer than one row, the rounded tail would
+    # otherwise start inside the head and re-print bytes already shown.
+    tail_start = max(head, (n - head) & ~15)
+    rows = _hexdump_rows(mv[:head], prefix, 0)
+    if tail_start > head:
+        rows.append(f"{prefix}[... {tail_start - head} bytes skipped ...]")
+    rows += _hexdump_rows(mv[tail_start:], prefix, tail_start)
+    return "\n".join(rows)
+
+
+# Reusable receive buffers; recv_frame reads straight into them.
+_recv_hdr = bytearray(5)
+_recv_buf = bytearray(1 << 20)
+
+
+def _recv_into_exact(sock: socket.socket, mv: memoryview) -> None:
+    got = 0
+    n = len(mv)
+    while got < n:
+        r = sock.recv_into(mv[got:], n - got)
+        if r == 0:
             raise EOFError("socket closed")
-        buf += chunk
-    return bytes(buf)
+        got += r
 
 
-def recv_frame(sock: socket.socket) -> Tuple[int, bytes]:
-    hdr = recv_exact(sock, 5)
-    length = struct.unpack(">I", hdr[:4])[0]
-    ftype = hdr[4]
+def recv_frame(sock: socket.socket) -> Tuple[int, memoryview]:
+    """
+    Read one frame straight off the socket: the 5-byte header, then the
+    payload into a reusable buffer. The returned view is valid until the next
+    call. Reading unbuffered keeps select() honest: once the selector reports
+    the socket readable, no frame bytes can be hiding in a userspace buffer.
+    """
+    global _recv_buf
+    _recv_into_exact(sock, memoryview(_recv_hdr))
+    length, ftype = _U32BE_U8.unpack(_recv_hdr)
     if length == 0:
         raise ValueError("invalid frame length=0")
     payload_len = length - 1
-    payload = recv_exact(sock, payload_len) if payload_len else b""
-    return ftype, payload
+    if payload_len > len(_recv_buf):
+        _recv_buf = bytearray(payload_len)
+    mv = memoryview(_recv_buf)[:payload_len]
+    if payload_len:
+        _recv_into_exact(sock, mv)
+    return ftype, mv
 
 
 def send_frame(sock: socket.socket, ftype: int, payload: bytes) -> None:
     length = 1 + len(payload)
-    sock.sendall(struct.pack(">IB", length, ftype) + payload)
+    sock.sendall(_U32BE_U8.pack(length, ftype) + payload)
+
+
+def tune_socket(sock: socket.socket) -> None:
+    """
+    Disable Nagle and enlarge the socket buffers: RAW_IN chunk sequences are
+    many small sends that otherwise stall on delayed-ACK coalescing, and the
+    default buffers throttle large DATA relays. On Linux, TCP_QUICKACK also
+    suppresses delayed ACKs for the small 5-byte frame headers.
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 << 20)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+    except OSError:
+        pass
+    if hasattr(socket, "TCP_QUICKACK"):
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        except OSError:
+            pass
 
 
 def head8(b: bytes) -> str:
     return " ".join(f"{x:02x}" for x in b[:8])
 
 
-def send_raw_in_chunks(sock: socket.socket, payload: bytes, chunk_max: int, log) -> None:
+def send_raw_in_chunks(sock: socket.socket, payload: bytes, chunk_max: int, log, add_zlp: bool = False) -> None:
     """
     Send RAW_IN payload to ESP split into <=chunk_max frames.
     This is required because ESP buffers one RAW_IN frame in a fixed-size slot (512 bytes by default).
+    All frame headers + chunks are packed into one buffer and shipped with a
+    single sendall instead of one send (plus a header concat) per chunk.
+    With add_zlp, the trailing RAW_IN ZLP frame rides in the same buffer.
     """
     if chunk_max <= 0:
         raise ValueError("chunk_max must be > 0")
-    if len(payload) == 0:
+    n = len(payload)
+    if n == 0:
         send_frame(sock, T_RAW_IN, b"")
         log("ESP<-PY RAW_IN send ZLP")
         return
-    off = 0
+    nchunks = (n + chunk_max - 1) // chunk_max
+    out = bytearray(5 * nchunks + n + (5 if add_zlp else 0))
+    mv = memoryview(payload)
+    lines = []
+    pos = 0
     idx = 0
-    while off < len(payload):
-        part = payload[off : off + chunk_max]
-        send_frame(sock, T_RAW_IN, part)
-        log(f"ESP<-PY RAW_IN send chunk[{idx}] bytes={len(part)} head={head8(part)}")
-        off += len(part)
+    for off in range(0, n, chunk_max):
+        part = mv[off : off + chunk_max]
+        plen = len(part)
+        _U32BE_U8.pack_into(out, pos, 1 + plen, T_RAW_IN)
+        out[pos + 5 : pos + 5 + plen] = part
+        lines.append(f"ESP<-PY RAW_IN send chunk[{idx}] bytes={plen} head={head8(part)}")
+        pos += 5 + plen
         idx += 1
+    if add_zlp:
+        _U32BE_U8.pack_into(out, pos, 1, T_RAW_IN)
+        lines.append("ESP<-PY RAW_IN send ZLP")
+    sock.sendall(out)
+    for line in lines:
+        log(line)
 
-def _le32(b: bytes, off: int = 0) -> int:
-    return struct.unpack_from("<I", b, off)[0]
+def _le32(b, off: int = 0) -> int:
+    # int.from_bytes returns a naked int directly (no unpack result tuple);
+    # works on bytes, bytearray and memoryview alike.
+    return int.from_bytes(b[off : off + 4], "little")
 
-def _le16(b: bytes, off: int = 0) -> int:
-    return struct.unpack_from("<H", b, off)[0]
+def _le16(b, off: int = 0) -> int:
+    return int.from_bytes(b[off : off + 2], "little")
 
 def parse_ptp_container_header(b: bytes) -> Tuple[int, int, int, int]:
     if len(b) < 12:
@@ -128,148 +216,141 @@ def parse_ptp_container_header(b: bytes) -> Tuple[int, int, int, int]:
     tid = _le32(b, 8)
     return total_len, ctype, code, tid
 
+def _bulk_chunk_size(ep_in) -> int:
+    # A URB sized as a whole number of wMaxPacketSize packets keeps libusb
+    # from padding the request with a trailing short packet.
+    mps = int(ep_in.wMaxPacketSize)
+    if mps <= 0:
+        return 65536
+    return max(mps, (65536 // mps) * mps)
+
+
+# Reusable bulk IN scratch buffer: ep_in.read(buffer, ...) fills it in place.
+# pyusb only reads in place into array.array buffers (anything else is handed
+# to usb.util.create_buffer, which rejects it), so chunks land here and get
+# copied into the preallocated container.
+_rx_scratch = array("B", bytes(65536))
+
+
 def read_ptp_container(ep_in, timeout_ms: int = 5000) -> bytes:
     """
     Read one full PTP container from bulk IN using the <len32,...> header.
+    Large reads let libusb submit one URB covering many USB packets instead
+    of one Python round trip per wMaxPacketSize packet.
     """
-    first = ep_in.read(ep_in.wMaxPacketSize, timeout=timeout_ms).tobytes()
-    if len(first) < 12:
-        raise RuntimeError(f"short read ({len(first)} bytes)")
-    total_len = _le32(first, 0)
+    global _rx_scratch
+    chunk = _bulk_chunk_size(ep_in)
+    if len(_rx_scratch) < chunk:
+        _rx_scratch = array("B", bytes(chunk))
+    scratch = _rx_scratch
+    scratch_mv = memoryview(scratch)
+    read = ep_in.read
+    n = read(scratch, timeout=timeout_ms)
+    if n < 12:
+        raise RuntimeError(f"short read ({n} bytes)")
+    total_len = _le32(scratch, 0)
     if total_len < 12:
         raise RuntimeError(f"invalid PTP length={total_len}")
-    buf = bytearray(first)
-    while len(buf) < total_len:
-        buf += ep_in.read(ep_in.wMaxPacketSize, timeout=timeout_ms).tobytes()
-    return bytes(buf[:total_len])
+    if total_len <= n:
+        return bytes(scratch_mv[:total_len])
+    # total_len is known from the header: preallocate the container once and
+    # copy each scratch chunk into place, instead of growing a bytearray
+    # (realloc) plus a throwaway .tobytes() copy per USB packet.
+    buf = bytearray(total_len)
+    mv = memoryview(buf)
+    pos = min(n, total_len)
+    mv[:pos] = scratch_mv[:pos]
+    while pos < total_len:
+        n = read(scratch, timeout=timeout_ms)
+        take = min(n, total_len - pos)
+        mv[pos : pos + take] = scratch_mv[:take]
+        pos += take
+    return bytes(buf)
 
-def parse_rs3_command(payload: bytes) -> Tuple[str, int, int, int, bytes]:
+def parse_rs3_container(payload: bytes) -> Tuple[str, int, int, int, memoryview]:
     """
-    Parse RS3/DJI command variants we observed and return:
-      (layout, type, code, tid, params_bytes)
+    Parse RS3/DJI container variants we observed and return:
+      (layout, type, code, tid, tail)
     layouts:
-      - "dji_pad24": 00 00 00 [type16le@3][code16le@5][tid32le@7][params...]
-      - "dji_pad16": 00 00 [type16le@2][code16le@4][tid32le@6][params...]
-      - "dji_pad8" : 00 [type16le@1][code16le@3][tid32le@5][params...]
-      - "std_len"  : [len32][type16le][code16le][tid32le][params...]
-      - "alt_len"  : [len32][code16le][tid32le][type16le][params...]
+      - "dji_pad24": 00 00 00 [type16le@3][code16le@5][tid32le@7][tail...]
+      - "dji_pad16": 00 00 [type16le@2][code16le@4][tid32le@6][tail...]
+      - "dji_pad8" : 00 [type16le@1][code16le@3][tid32le@5][tail...]
+      - "std_len"  : [len32][type16le][code16le][tid32le][tail...]
+      - "alt_len"  : [len32][code16le][tid32le][type16le][tail...]
+    The tail is returned raw; COMMAND callers truncate it to full uint32
+    params themselves (`tail[: len(tail) & ~3]` — RS3/DJI sometimes appends
+    padding bytes such as an extra 0x01 after tid), so DATA and COMMAND
+    stages share one parse.
     """
     b = payload
     n = len(b)
-    def params_aligned(off: int) -> bytes:
-        # RS3/DJI sometimes appends extra padding bytes (e.g. an extra 0x01) after tid.
-        # For PTP standard command params must be 32-bit aligned. Keep only full uint32 params.
-        if n <= off:
-            return b""
-        tail = b[off:]
-        return tail[: (len(tail) // 4) * 4]
-
-    if n >= 11 and b[0] == 0x00 and b[1] == 0x00 and b[2] == 0x00:
-        ctype = _le16(b, 3)
-        code = _le16(b, 5)
-        tid = _le32(b, 7)
-        return "dji_pad24", ctype, code, tid, params_aligned(11)
-    if n >= 10 and b[0] == 0x00 and b[1] == 0x00:
-        ctype = _le16(b, 2)
-        code = _le16(b, 4)
-        tid = _le32(b, 6)
-        return "dji_pad16", ctype, code, tid, params_aligned(10)
-    if n >= 9 and b[0] == 0x00:
-        ctype = _le16(b, 1)
-        code = _le16(b, 3)
-        tid = _le32(b, 5)
-        return "dji_pad8", ctype, code, tid, params_aligned(9)
-    if n >= 12:
-        length = _le32(b, 0)
-        t_std = _le16(b, 4)
-        if 1 <= t_std <= 4:
-            code = _le16(b, 6)
-            tid = _le32(b, 8)
-            # params are in remaining bytes (ignore length mismatch; we just pass through)
-            return "std_len", t_std, code, tid, params_aligned(12)
-        t_alt = _le16(b, 10)
-        if 1 <= t_alt <= 4:
-            code = _le16(b, 4)
-            tid = _le32(b, 6)
-            return "alt_len", t_alt, code, tid, params_aligned(12)
-    raise ValueError("unknown RS3 command layout")
+    mv = memoryview(b)
 
+    def tail(off: int) -> memoryview:
+        return mv[off:]
 
-def parse_rs3_container(payload: bytes, *, align_tail_u32: bool) -> Tuple[str, int, int, int, bytes]:
-    """
-    Parse RS3/DJI container variants and return:
-      (layout, type, code, tid, tail_bytes)
-    If align_tail_u32=True, tail is truncated to full uint32 params (PTP COMMAND params).
-    If align_tail_u32=False, tail is returned raw (PTP DATA payload).
-    """
-    b = payload
-    n = len(b)
-
-    def tail(off: int) -> bytes:
-        if n <= off:
-            return b""
-        t = b[off:]
-        if not align_tail_u32:
-            return t
-        return t[: (len(t) // 4) * 4]
-
-    if n >= 11 and b[0] == 0x00 and b[1] == 0x00 and b[2] == 0x00:
-        ctype = _le16(b, 3)
-        code = _le16(b, 5)
-        tid = _le32(b, 7)
-        return "dji_pad24", ctype, code, tid, tail(11)
-    if n >= 10 and b[0] == 0x00 and b[1] == 0x00:
-        ctype = _le16(b, 2)
-        code = _le16(b, 4)
-        tid = _le32(b, 6)
-        return "dji_pad16", ctype, code, tid, tail(10)
+    # One look at b[0] picks the layout family: the DJI pad variants all start
+    # with zero bytes, so a non-zero first byte goes straight to the two
+    # length-field layouts without three failed prefix checks (std_len is the
+    # common case). Within the pad family the deepest zero prefix wins.
     if n >= 9 and b[0] == 0x00:
-        ctype = _le16(b, 1)
-        code = _le16(b, 3)
-        tid = _le32(b, 5)
-        return "dji_pad8", ctype, code, tid, tail(9)
+        if b[1] == 0x00:
+            if n >= 11 and b[2] == 0x00:
+                return "dji_pad24", _le16(b, 3), _le16(b, 5), _le32(b, 7), tail(11)
+            if n >= 10:
+                return "dji_pad16", _le16(b, 2), _le16(b, 4), _le32(b, 6), tail(10)
+        return "dji_pad8", _le16(b, 1), _le16(b, 3), _le32(b, 5), tail(9)
     if n >= 12:
-        length = _le32(b, 0)
+        # Ignore any length-field mismatch; we just pass the tail through.
         t_std = _le16(b, 4)
         if 1 <= t_std <= 4:
-            code = _le16(b, 6)
-            tid = _le32(b, 8)
-            return "std_len", t_std, code, tid, tail(12)
+            return "std_len", t_std, _le16(b, 6), _le32(b, 8), tail(12)
         t_alt = _le16(b, 10)
         if 1 <= t_alt <= 4:
-            code = _le16(b, 4)
-            tid = _le32(b, 6)
-            return "alt_len", t_alt, code, tid, tail(12)
+            return "alt_len", t_alt, _le16(b, 4), _le32(b, 6), tail(12)
     raise ValueError("unknown RS3 container layout")
 
-def build_std_command_container(code: int, tid: int, params_bytes: bytes) -> bytes:
-    # Standard PTP command: len32,type16,code16,tid32 + params (4-byte LE)
+
+def build_std_command_container(code: int, tid: int, params_bytes) -> bytes:
+    # Standard PTP command: len32,type16,code16,tid32 + params (4-byte LE).
+    # params_bytes may be a memoryview; the single copy into `out` is the only one.
     total_len = 12 + len(params_bytes)
-    return struct.pack("<IHHI", total_len, PTP_CT_COMMAND, code & 0xFFFF, tid & 0xFFFFFFFF) + params_bytes
+    out = bytearray(total_len)
+    _HDR_LE.pack_into(out, 0, total_len, PTP_CT_COMMAND, code & 0xFFFF, tid & 0xFFFFFFFF)
+    out[12:] = params_bytes
+    return bytes(out)
 
 
-def build_std_data_container(code: int, tid: int, data_bytes: bytes) -> bytes:
+def build_std_data_container(code: int, tid: int, data_bytes) -> bytes:
     total_len = 12 + len(data_bytes)
-    return struct.pack("<IHHI", total_len, PTP_CT_DATA, code & 0xFFFF, tid & 0xFFFFFFFF) + data_bytes
+    out = bytearray(total_len)
+    _HDR_LE.pack_into(out, 0, total_len, PTP_CT_DATA, code & 0xFFFF, tid & 0xFFFFFFFF)
+    out[12:] = data_bytes
+    return bytes(out)
 
 
 def _read_until_response(ep_in, timeout_ms: int = 1200) -> Optional[bytes]:
     """
-    Best-effort read: try to read one or more PTP containers until we see RESPONSE (type=3).
-    Returns the RESPONSE container bytes or None.
+    Best-effort read for a RESPONSE container (type=3): libusb bounds the wait
+    itself via the read timeout, so the common case is exactly one timed read.
+    We only loop (with the leftover monotonic budget) when the camera
+    interleaves a non-RESPONSE container first. Returns the RESPONSE container
+    bytes or None.
     """
-    deadline = time.time() + (timeout_ms / 1000.0)
-    while time.time() < deadline:
+    deadline = time.monotonic() + timeout_ms / 1000.0
+    remaining_ms = timeout_ms
+    while remaining_ms > 0:
         try:
-            cont = read_ptp_container(ep_in, timeout_ms=int(max(100, (deadline - time.time()) * 1000)))
+            cont = read_ptp_container(ep_in, timeout_ms=remaining_ms)
         except Exception:
             return None
         try:
             _, ctype, _, _ = parse_ptp_container_header(cont)
         except Exception:
-            continue
+            ctype = -1
         if ctype == PTP_CT_RESPONSE:
             return cont
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
     return None
 
 
@@ -292,7 +373,7 @@ def best_effort_close_camera_session(ep_out, ep_in, log) -> None:
 
     # 2) Try OpenSession (sid=1), then CloseSession.
     try:
-        sid = struct.pack("<I", 1)
+        sid = _LE32.pack(1)
         ep_out.write(build_std_command_container(PTP_OC_OPEN_SESSION, tid=2, params_bytes=sid), timeout=1000)
         resp = _read_until_response(ep_in, timeout_ms=1200)
         if resp:
@@ -310,36 +391,59 @@ def best_effort_close_camera_session(ep_out, ep_in, log) -> None:
     except Exception as e:
         log(f"Camera preflight: CloseSession(2) failed: {e}")
 
-def build_rs3_container(layout: str, ctype: int, code: int, tid: int, payload: bytes) -> bytes:
+def _build_pad_rs3(prefix: int, ctype: int, code: int, tid: int, payload) -> bytes:
+    # DJI padded layout: `prefix` zero bytes, then type16/code16/tid32, then
+    # payload. Sizing the buffer up front (>= 12 bytes for a zero-payload
+    # RESPONSE, which RS3 may expect) makes the zero prefix and tail padding
+    # come free with the allocation — a fresh bytearray is already zeroed, so
+    # no per-layout prefix constant ever needs to be copied in. The whole
+    # container is one pack_into + one payload copy.
+    n = len(payload)
+    size = prefix + 8 + n
+    if ctype == PTP_CT_RESPONSE and n == 0 and size < 12:
+        size = 12
+    out = bytearray(size)
+    _PAD_HDR_LE.pack_into(out, prefix, ctype & 0xFFFF, code & 0xFFFF, tid & 0xFFFFFFFF)
+    out[prefix + 8 : prefix + 8 + n] = payload
+    return bytes(out)
+
+
+def _build_std_rs3(ctype: int, code: int, tid: int, payload) -> bytes:
+    total_len = 12 + len(payload)
+    out = bytearray(total_len)
+    _HDR_LE.pack_into(out, 0, total_len, ctype & 0xFFFF, code & 0xFFFF, tid & 0xFFFFFFFF)
+    out[12:] = payload
+    return bytes(out)
+
+
+def _build_alt_rs3(ctype: int, code: int, tid: int, payload) -> bytes:
+    total_len = 12 + len(payload)
+    out = bytearray(total_len)
+    _ALT_LE.pack_into(out, 0, total_len, code & 0xFFFF, tid & 0xFFFFFFFF, ctype & 0xFFFF)
+    out[12:] = payload
+    return bytes(out)
+
+
+# Layout name -> builder / header size: one dict lookup per container instead
+# of a chain of string compares in the per-container loop.
+_BUILDERS = {
+    "dji_pad24": partial(_build_pad_rs3, 3),
+    "dji_pad16": partial(_build_pad_rs3, 2),
+    "dji_pad8": partial(_build_pad_rs3, 1),
+    "alt_len": _build_alt_rs3,
+    "std_len": _build_std_rs3,
+}
+_HSZ = {"dji_pad24": 11, "dji_pad16": 10, "dji_pad8": 9}
+
+
+def build_rs3_container(layout: str, ctype: int, code: int, tid: int, payload) -> bytes:
     """
     Build RS3-side container using the same layout we received commands with.
     For DATA/RESP from camera, we use (ctype, code, tid) from camera header and payload bytes.
+    payload may be bytes or a memoryview; it is copied once, into the output.
+    Unknown layouts fall back to std_len.
     """
-    if layout == "dji_pad24":
-        hdr = b"\x00\x00\x00" + struct.pack("<HHI", ctype & 0xFFFF, code & 0xFFFF, tid & 0xFFFFFFFF)
-        out = hdr + payload
-        # For RESPONSE (no payload), RS3 may expect >= 12 bytes (std header size). Pad with zeros to 12.
-        if ctype == PTP_CT_RESPONSE and len(payload) == 0 and len(out) < 12:
-            out += b"\x00" * (12 - len(out))
-        return out
-    if layout == "dji_pad16":
-        hdr = b"\x00\x00" + struct.pack("<HHI", ctype & 0xFFFF, code & 0xFFFF, tid & 0xFFFFFFFF)
-        out = hdr + payload
-        if ctype == PTP_CT_RESPONSE and len(payload) == 0 and len(out) < 12:
-            out += b"\x00" * (12 - len(out))
-        return out
-    if layout == "dji_pad8":
-        hdr = b"\x00" + struct.pack("<HHI", ctype & 0xFFFF, code & 0xFFFF, tid & 0xFFFFFFFF)
-        out = hdr + payload
-        if ctype == PTP_CT_RESPONSE and len(payload) == 0 and len(out) < 12:
-            out += b"\x00" * (12 - len(out))
-        return out
-    if layout == "alt_len":
-        total_len = 12 + len(payload)
-        return struct.pack("<IHIH", total_len, code & 0xFFFF, tid & 0xFFFFFFFF, ctype & 0xFFFF) + payload
-    # std_len default
-    total_len = 12 + len(payload)
-    return struct.pack("<IHHI", total_len, ctype & 0xFFFF, code & 0xFFFF, tid & 0xFFFFFFFF) + payload
+    return _BUILDERS.get(layout, _build_std_rs3)(ctype, code, tid, payload)
 
 
 def find_camera(vid: Optional[int], pid: Optional[int], pick: int):
@@ -411,19 +515,34 @@ def main() -> int:
                     help="Do not send an explicit RAW_IN ZLP frame after IN payloads whose length is a multiple of 64.")
     ap.add_argument("--rs3-in-chunk", type=int, default=512,
                     help="Max RAW_IN payload chunk size to send to ESP (ESP buffers per-frame; default 512).")
+    ap.add_argument("--no-hex", action="store_true",
+                    help="Skip hexdumps in the log file (faster during DATA bursts).")
+    ap.add_argument("--log-max-hex", type=int, default=256,
+                    help="Max payload bytes to hexdump per frame, head/tail split (0 = no limit; default 256).")
     ap.add_argument("--vid", type=lambda s: int(s, 0), default=None)
     ap.add_argument("--pid", type=lambda s: int(s, 0), default=None)
     ap.add_argument("--pick", type=int, default=0)
     args = ap.parse_args()
 
-    log_f = open(args.log, "a", encoding="utf-8")
-
-    def log(msg: str) -> None:
-        ts = time.strftime("%H:%M:%S")
-        line = f"[{ts}] {msg}"
-        print(line)
-        log_f.write(line + "\n")
-        log_f.flush()
+    # All formatting and file/console writes happen on the QueueListener's
+    # background thread; the proxy loop only enqueues records, so RAW_IN
+    # delivery latency stays independent of disk and terminal speed.
+    log_q: queue.SimpleQueue = queue.SimpleQueue()
+    fmt = logging.Formatter("[%(asctime)s] %(message)s", datefmt="%H:%M:%S")
+    file_handler = logging.FileHandler(args.log)
+    file_handler.setFormatter(fmt)
+    con_handler = logging.StreamHandler(sys.stdout)
+    con_handler.setFormatter(fmt)
+    con_handler.setLevel(logging.INFO)  # hexdumps (DEBUG) go to the file only
+    listener = logging.handlers.QueueListener(log_q, file_handler, con_handler, respect_handler_level=True)
+    listener.start()
+    logger = logging.getLogger("rs3_ptp_raw_proxy")
+    logger.setLevel(logging.INFO if args.no_hex else logging.DEBUG)
+    logger.addHandler(logging.handlers.QueueHandler(log_q))
+    logger.propagate = False
+    log = logger.info
+    dump_hex = logger.isEnabledFor(logging.DEBUG)
+    max_hex = args.log_max_hex
 
     cam = None  # tuple: (dev, ifnum, ep_in_addr, ep_out_addr, ep_in, ep_out)
     if args.camera:
@@ -439,8 +558,23 @@ def main() -> int:
     log(f"Connecting to ESP raw proxy {args.esp_host}:{args.esp_port} ...")
     sock = socket.create_connection((args.esp_host, args.esp_port), timeout=5)
     sock.settimeout(None)
+    tune_socket(sock)
+    sel = selectors.DefaultSelector()
+    sel.register(sock, selectors.EVENT_READ)
     log("Connected.")
 
+    # Bind per-frame argument attributes and module constants to locals once:
+    # inside the loop each becomes a LOAD_FAST instead of a dict lookup.
+    translate = args.translate
+    no_zlp = args.no_zlp
+    in_chunk = args.rs3_in_chunk
+    in_layout = args.rs3_in_layout
+    resp_pad01 = args.rs3_resp_pad01
+    T_DONE = T_RAW_DONE
+    CT_CMD = PTP_CT_COMMAND
+    CT_DATA = PTP_CT_DATA
+    CT_RESP = PTP_CT_RESPONSE
+
     # Some PTP operations are 2-stage: COMMAND (host->device) then DATA (host->device),
     # then the camera replies with DATA/RESPONSE. Remember the last command so we can
     # wrap the RS3 DATA stage into a standard PTP DATA container for the camera.
@@ -450,14 +584,17 @@ def main() -> int:
 
     try:
         while True:
+            # Park in select() rather than inside recv() while waiting for
+            # the next frame.
+            sel.select()
             ftype, payload = recv_frame(sock)
             if ftype != T_RAW_OUT:
                 log(f"Unexpected frame type=0x{ftype:02x} len={len(payload)}")
                 continue
 
             log(f"RS3->ESP RAW_OUT bytes={len(payload)}")
-            log_f.write(hexdump(payload, prefix="  ") + "\n")
-            log_f.flush()
+            if dump_hex:
+                logger.debug(hexdump(payload, prefix="  ", max_bytes=max_hex))
 
             if cam is None:
                 continue
@@ -471,36 +608,36 @@ def main() -> int:
             rs3_layout = None
             last_op = None
             rs3_stage = None  # "cmd" | "data" | None
-            if args.translate:
+            if translate:
                 try:
-                    rs3_layout, ctype, code, tid, tail = parse_rs3_container(payload, align_tail_u32=True)
+                    rs3_layout, ctype, code, tid, tail = parse_rs3_container(payload)
                 except Exception as e:
                     log(f"Translate: cannot parse RS3 container: {e}")
-                    send_frame(sock, T_RAW_DONE, b"")
+                    send_frame(sock, T_DONE, b"")
                     log("ESP<-PY RAW_DONE")
                     continue
 
-                if ctype == PTP_CT_COMMAND:
-                    cam_out = build_std_command_container(code, tid, tail)
+                if ctype == CT_CMD:
+                    params = tail[: len(tail) & ~3]
+                    cam_out = build_std_command_container(code, tid, params)
                     last_op = code
                     pending_cam_op = code
                     pending_cam_tid = tid
                     pending_rs3_layout = rs3_layout
                     rs3_stage = "cmd"
                     log(f"Translate: {rs3_layout} -> std_len CMD op=0x{code:04x} tid={tid} bytes={len(cam_out)}")
-                elif ctype == PTP_CT_DATA:
-                    # Re-parse without alignment to preserve DATA payload bytes.
-                    rs3_layout, _, code2, tid2, data_tail = parse_rs3_container(payload, align_tail_u32=False)
-                    op = pending_cam_op if pending_cam_op is not None else code2
-                    tid_use = pending_cam_tid if pending_cam_tid is not None else tid2
+                elif ctype == CT_DATA:
+                    # The raw tail from the single parse is the DATA payload.
+                    op = pending_cam_op if pending_cam_op is not None else code
+                    tid_use = pending_cam_tid if pending_cam_tid is not None else tid
                     rs3_layout = pending_rs3_layout if pending_rs3_layout is not None else rs3_layout
-                    cam_out = build_std_data_container(op, tid_use, data_tail)
+                    cam_out = build_std_data_container(op, tid_use, tail)
                     last_op = op
                     rs3_stage = "data"
-                    log(f"Translate: {rs3_layout} -> std_len DATA op=0x{op:04x} tid={tid_use} bytes={len(cam_out)} payload={len(data_tail)}")
+                    log(f"Translate: {rs3_layout} -> std_len DATA op=0x{op:04x} tid={tid_use} bytes={len(cam_out)} payload={len(tail)}")
                 else:
                     log(f"Translate: ignoring container type={ctype}")
-                    send_frame(sock, T_RAW_DONE, b"")
+                    send_frame(sock, T_DONE, b"")
                     log("ESP<-PY RAW_DONE")
                     continue
 
@@ -514,7 +651,7 @@ def main() -> int:
                     log("Cleared camera OUT halt.")
                 except Exception:
                     pass
-                send_frame(sock, T_RAW_DONE, b"")
+                send_frame(sock, T_DONE, b"")
                 log("ESP<-PY RAW_DONE")
                 continue
 
@@ -540,11 +677,11 @@ def main() -> int:
                         if rs3_stage == "cmd":
                             log(f"Camera awaiting RS3 DATA stage (no reply after CMD): {e}")
                             # Let ESP re-arm OUT so RS3 can send DATA.
-                            send_frame(sock, T_RAW_DONE, b"")
+                            send_frame(sock, T_DONE, b"")
                             log("ESP<-PY RAW_DONE")
                             break
                         log(f"Camera read timeout: {e}")
-                        send_frame(sock, T_RAW_DONE, b"")
+                        send_frame(sock, T_DONE, b"")
                         log("ESP<-PY RAW_DONE")
                         break
                     log(f"Camera read failed: {e}")
@@ -553,12 +690,12 @@ def main() -> int:
                         log("Cleared camera IN halt.")
                     except Exception:
                         pass
-                    send_frame(sock, T_RAW_DONE, b"")
+                    send_frame(sock, T_DONE, b"")
                     log("ESP<-PY RAW_DONE")
                     break
                 except Exception as e:
                     log(f"Camera read failed: {e}")
-                    send_frame(sock, T_RAW_DONE, b"")
+                    send_frame(sock, T_DONE, b"")
                     log("ESP<-PY RAW_DONE")
                     break
 
@@ -568,16 +705,16 @@ def main() -> int:
                     total_len, ctype, code, tid = (len(cont), -1, -1, -1)
 
                 log(f"CAM->RS3 RAW_IN PTP bytes={len(cont)} type={ctype} code=0x{code:04x} tid={tid}")
-                log_f.write(hexdump(cont, prefix="  ") + "\n")
-                log_f.flush()
+                if dump_hex:
+                    logger.debug(hexdump(cont, prefix="  ", max_bytes=max_hex))
                 out_bytes = cont
-                if args.translate and rs3_layout is not None:
+                if translate and rs3_layout is not None:
                     # Convert standard camera container to RS3-side format.
-                    payload_bytes = cont[12:]
+                    payload_bytes = memoryview(cont)[12:]
                     send_code = code
                     # Some cameras reply SessionAlreadyOpen to OpenSession if a previous session exists.
                     # RS3 expects OpenSession OK; treat this as OK on the RS3-facing side to proceed.
-                    if ctype == PTP_CT_RESPONSE and last_op == 0x1002 and code == PTP_RC_SESSION_ALREADY_OPEN:
+                    if ctype == CT_RESP and last_op == 0x1002 and code == PTP_RC_SESSION_ALREADY_OPEN:
                         send_code = PTP_RC_OK
                         # IMPORTANT: camera may include response parameters (len=16). RS3 expects OpenSession OK
                         # without response parameters, so drop them when overriding.
@@ -585,8 +722,8 @@ def main() -> int:
                         log("Translate: overriding OpenSession SessionAlreadyOpen -> OK for RS3")
                     # Decide which RS3-facing format to send.
                     rs3_reply_layout = rs3_layout
-                    if args.rs3_in_layout != "auto":
-                        rs3_reply_layout = args.rs3_in_layout
+                    if in_layout != "auto":
+                        rs3_reply_layout = in_layout
 
                     if rs3_reply_layout == "camera":
                         # Send camera bytes as-is (but still allow overriding response code, e.g. OpenSession).
@@ -598,16 +735,9 @@ def main() -> int:
                     else:
                         out_bytes = build_rs3_container(rs3_reply_layout, ctype, send_code, tid, payload_bytes)
                     # Optional quirk: add 0x01 after tid for RESPONSE only (before zero padding)
-                    if args.rs3_resp_pad01 and ctype == PTP_CT_RESPONSE and len(payload_bytes) == 0:
+                    if resp_pad01 and ctype == CT_RESP and len(payload_bytes) == 0:
                         # Insert after header (layout-specific header size)
-                        if rs3_reply_layout == "dji_pad24":
-                            hsz = 11
-                        elif rs3_reply_layout == "dji_pad16":
-                            hsz = 10
-                        elif rs3_reply_layout == "dji_pad8":
-                            hsz = 9
-                        else:
-                            hsz = None
+                        hsz = _HSZ.get(rs3_reply_layout)
                         if hsz is not None and len(out_bytes) >= hsz:
                             out_bytes = out_bytes[:hsz] + b"\x01" + out_bytes[hsz:]
                             if len(out_bytes) < 12:
@@ -615,24 +745,23 @@ def main() -> int:
                     log(f"Translate: std -> {rs3_reply_layout} bytes={len(out_bytes)}")
 
                 # Send camera->RS3 bytes via ESP. Chunk if needed (ESP buffers per RAW_IN frame).
-                send_raw_in_chunks(sock, out_bytes, args.rs3_in_chunk, log)
-
-                # ZLP decision must be based on what RS3 actually receives (out_bytes).
-                if (not args.no_zlp) and (len(out_bytes) % 64) == 0:
-                    send_frame(sock, T_RAW_IN, b"")
-                    log("ESP<-PY RAW_IN send ZLP")
+                # ZLP decision must be based on what RS3 actually receives (out_bytes);
+                # the ZLP frame is batched into the same sendall as the chunks.
+                add_zlp = (not no_zlp) and (len(out_bytes) % 64) == 0
+                send_raw_in_chunks(sock, out_bytes, in_chunk, log, add_zlp=add_zlp)
 
-                if ctype == PTP_CT_RESPONSE:
+                if ctype == CT_RESP:
                     pending_cam_op = None
                     pending_cam_tid = None
                     pending_rs3_layout = None
-                    send_frame(sock, T_RAW_DONE, b"")
+                    send_frame(sock, T_DONE, b"")
                     log("ESP<-PY RAW_DONE")
                     break
 
     except EOFError:
         log("ESP disconnected.")
     finally:
+        sel.close()
         try:
             sock.close()
         except Exception:
@@ -647,7 +776,7 @@ def main() -> int:
                 usb.util.dispose_resources(dev)
             except Exception:
                 pass
-        log_f.close()
+        listener.stop()
 
     return 0
 
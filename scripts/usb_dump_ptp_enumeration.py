@@ -18,89 +18,413 @@ macOS tips:
 from __future__ import annotations
 
 import argparse
+import atexit
+import json
+import os
+import struct
+import sys
 from typing import Optional, Tuple
 
+import usb.backend.libusb1
+import usb.control
 import usb.core
 import usb.util
 
+try:
+    import usb1  # optional: python-libusb1, enables a no-open snapshot scan
+except ImportError:
+    usb1 = None
+
 
 PTP_CLASS, PTP_SUBCLASS, PTP_PROTOCOL = 0x06, 0x01, 0x01
 
+# usb.core.find() without an explicit backend re-runs the backend discovery
+# (ctypes library probing across candidate paths) on every call; resolve the
+# libusb1 backend once at import and reuse it. None falls back to pyusb's
+# own per-call discovery.
+try:
+    _BACKEND = usb.backend.libusb1.get_backend()
+except Exception:
+    _BACKEND = None
+
+# The class/subclass/protocol bytes as they appear back-to-back at offset 5
+# of a raw interface descriptor, for a single slice compare.
+_PTP_TRIPLE_BYTES = bytes((PTP_CLASS, PTP_SUBCLASS, PTP_PROTOCOL))
+
+# Same triple packed class-high for a single folded-int compare.
+PTP_TRIPLE = (PTP_CLASS << 16) | (PTP_SUBCLASS << 8) | PTP_PROTOCOL
+
+_DT_INTERFACE = 0x04
+
+
+def _hex(s: str) -> int:
+    # int(s, 16) on the sliced digits skips int()'s base-sniffing for the
+    # common 0xNNNN spelling; plain decimal still works.
+    return int(s[2:], 16) if s[:2] in ("0x", "0X") else int(s)
+
+
+def get_langid(dev: usb.core.Device) -> Optional[int]:
+    # One GET_DESCRIPTOR(STRING, 0) fetches the supported-language table;
+    # without an explicit langid, usb.util.get_string repeats this control
+    # transfer for every string it reads.
+    try:
+        buf = dev.ctrl_transfer(0x80, 6, 0x0300, 0, 255)
+    except Exception:
+        return None
+    if len(buf) < 4:
+        return None
+    return struct.unpack("<H", bytes(buf[2:4]))[0]
 
-def get_str(dev: usb.core.Device, idx: int) -> Optional[str]:
+
+# String descriptors keyed by (device, index); devices that reuse one index
+# for several fields cost a single control transfer.
+_str_cache: dict = {}
+
+
+def get_str(dev: usb.core.Device, idx: int, langid: Optional[int] = None) -> Optional[str]:
     if not idx:
         return None
+    key = (id(dev), idx)
+    if key in _str_cache:
+        return _str_cache[key]
     try:
-        return usb.util.get_string(dev, idx)
+        val = usb.util.get_string(dev, idx, langid)
     except Exception:
-        return None
+        val = None
+    _str_cache[key] = val
+    return val
 
 
-def find_ptp_device(vid: Optional[int], pid: Optional[int], pick: int) -> Tuple[usb.core.Device, int, int]:
-    matches = []
-    for dev in usb.core.find(find_all=True):
-        if vid is not None and int(dev.idVendor) != vid:
-            continue
-        if pid is not None and int(dev.idProduct) != pid:
-            continue
+def _could_host_ptp(dev: usb.core.Device) -> bool:
+    # Cheap device-level filter using only the cached device descriptor:
+    # PTP cameras report bDeviceClass 0x00 (class per interface) or 0x06,
+    # so hubs (0x09), HID and the like are skipped before we ever fetch
+    # their configuration descriptors.
+    return dev.bDeviceClass in (0x00, PTP_CLASS)
+
+
+def _preflight_open(dev: usb.core.Device) -> None:
+    # Force libusb to open the device with the cheapest possible request
+    # (GET_DESCRIPTOR(DEVICE), answered from hardware on every USB device).
+    # On hosts where we lack permissions this fails immediately with one
+    # USBError, instead of surfacing as repeated failures later in the
+    # per-configuration fetches.
+    dev.ctrl_transfer(0x80, 6, usb.util.DESC_TYPE_DEVICE << 8, 0, 18)
+
+
+def _raw_has_ptp(dev: usb.core.Device) -> bool:
+    # Fetch each configuration descriptor as one raw blob and scan the flat
+    # bytes for an interface descriptor carrying the PTP triple. Compared to
+    # pyusb's `for cfg in dev: for intf in cfg` this skips building a
+    # Configuration/Interface/Endpoint object tree (and its per-attribute
+    # descriptor lookups) for every device that turns out not to be a camera.
+    for ci in range(dev.bNumConfigurations):
         try:
-            for cfg in dev:
-                for intf in cfg:
-                    if (intf.bInterfaceClass, intf.bInterfaceSubClass, intf.bInterfaceProtocol) == (PTP_CLASS, PTP_SUBCLASS, PTP_PROTOCOL):
-                        matches.append((dev, cfg.bConfigurationValue, intf.bInterfaceNumber))
+            head = usb.control.get_descriptor(dev, 9, usb.util.DESC_TYPE_CONFIG, ci)
+            total = int.from_bytes(bytes(head[2:4]), "little")
+            buf = bytes(usb.control.get_descriptor(dev, total, usb.util.DESC_TYPE_CONFIG, ci))
         except usb.core.USBError:
             continue
+        i, n = 0, len(buf)
+        while i + 2 <= n:
+            blen = buf[i]
+            if blen < 2:
+                break  # malformed descriptor, stop rather than loop forever
+            if buf[i + 1] == _DT_INTERFACE and buf[i + 5 : i + 8] == _PTP_TRIPLE_BYTES:
+                return True
+            i += blen
+    return False
+
+
+def _usb1_ptp_candidates(vid: Optional[int], pid: Optional[int]) -> Optional[list]:
+    """
+    Scan libusb's cached descriptor snapshot with python-libusb1 and return
+    the (vid, pid) pairs of devices hosting a PTP interface. No device is
+    opened: config descriptors come from the enumeration cache, so the whole
+    scan costs no bus traffic. Returns None when usb1 is unavailable or the
+    snapshot fails, in which case the caller falls back to the pyusb walk.
+    """
+    if usb1 is None:
+        return None
+    try:
+        with usb1.USBContext() as ctx:
+            out = []
+            for d in ctx.getDeviceList(skip_on_error=True):
+                if vid is not None and d.getVendorID() != vid:
+                    continue
+                if pid is not None and d.getProductID() != pid:
+                    continue
+                # Same device-class gate as _could_host_ptp, answered from the
+                # cached device descriptor before the settings walk.
+                if d.getDeviceClass() not in (0x00, PTP_CLASS):
+                    continue
+                try:
+                    for settings in d.iterSettings():
+                        if (
+                            settings.getClass() == PTP_CLASS
+                            and settings.getSubClass() == PTP_SUBCLASS
+                            and settings.getProtocol() == PTP_PROTOCOL
+                        ):
+                            out.append((d.getVendorID(), d.getProductID()))
+                            break
+                except usb1.USBError:
+                    continue
+            return out
+    except usb1.USBError:
+        return None
+
+
+def find_ptp_device(
+    vid: Optional[int], pid: Optional[int], pick: int, verbose: bool = False
+) -> Tuple[usb.core.Device, int, int, usb.core.Interface]:
+    # Let pyusb filter VID/PID at the descriptor-cache level instead of
+    # walking the configs of every device on the bus ourselves.
+    kwargs = {}
+    if vid is not None:
+        kwargs["idVendor"] = vid
+    if pid is not None:
+        kwargs["idProduct"] = pid
+
+    if _BACKEND is not None:
+        kwargs["backend"] = _BACKEND
+
+    if pick < 0:
+        raise SystemExit("--pick out of range")
+
+    # When usb1 is available, a single libusb_get_device_list snapshot
+    # (filtered entirely from cached descriptors — VID/PID, device class,
+    # interface triples) decides which devices are worth opening at all; the
+    # pyusb walk below then only ever opens known survivors. Without usb1 the
+    # walk falls back to the device-class heuristic alone.
+    prefilter = _could_host_ptp
+    cands = _usb1_ptp_candidates(vid, pid)
+    if cands:
+        allowed = set(cands)
+        if len(allowed) == 1:
+            kwargs["idVendor"], kwargs["idProduct"] = next(iter(allowed))
+        else:
+            prefilter = lambda d: (d.idVendor, d.idProduct) in allowed
+
+    # Only matches[pick] is ever consumed, so stop scanning as soon as it
+    # exists: with the default --pick 0 that is the first PTP interface found,
+    # and no further configuration descriptors are fetched from any device.
+    matches = []
+    scanned = []
+    try:
+        for dev in usb.core.find(find_all=True, custom_match=prefilter, **kwargs):
+            scanned.append(dev)
+            # Inaccessible devices (permissions, kernel claims) fail the
+            # preflight once and are skipped before any descriptor fetches.
+            try:
+                _preflight_open(dev)
+            except usb.core.USBError as e:
+                if verbose:
+                    sys.stderr.write(f"skipping {dev.idVendor:04x}:{dev.idProduct:04x}: {e}\n")
+                continue
+            # Raw-blob prefilter: only devices whose configuration bytes
+            # actually contain the PTP triple get the pyusb descriptor walk
+            # (which we still want for the match, to hand back live cfg/intf
+            # objects).
+            try:
+                if not _raw_has_ptp(dev):
+                    continue
+            except usb.core.USBError as e:
+                if verbose:
+                    sys.stderr.write(f"skipping {dev.idVendor:04x}:{dev.idProduct:04x}: {e}\n")
+                continue
+            try:
+                for cfg in dev:
+                    for intf in cfg:
+                        # Fold the three descriptor bytes into one int and
+                        # compare against the constant triple: one branch
+                        # instead of the three chained compares.
+                        if (
+                            (intf.bInterfaceClass << 16)
+                            | (intf.bInterfaceSubClass << 8)
+                            | intf.bInterfaceProtocol
+                        ) == PTP_TRIPLE:
+                            # Hand the interface descriptor back too: dump() reads
+                            # endpoints straight from it, with no second
+                            # configuration fetch and descriptor re-walk.
+                            matches.append((dev, cfg.bConfigurationValue, intf.bInterfaceNumber, intf))
+                            if len(matches) > pick:
+                                atexit.register(usb.util.dispose_resources, dev)
+                                return matches[pick]
+            except usb.core.USBError as e:
+                if verbose:
+                    sys.stderr.write(f"skipping {dev.idVendor:04x}:{dev.idProduct:04x}: {e}\n")
+                continue
+    finally:
+        # Free the libusb handles of every device we touched but did not pick;
+        # left to GC they linger until interpreter exit and can keep other
+        # tools (e.g. macOS PTPCamera) from re-opening the device.
+        chosen = matches[pick][0] if len(matches) > pick else None
+        for d in scanned:
+            if d is not chosen:
+                try:
+                    usb.util.dispose_resources(d)
+                except Exception:
+                    pass
 
     if not matches:
         raise SystemExit("No USB Still Image (PTP) interfaces found.")
-    if pick < 0 or pick >= len(matches):
-        raise SystemExit(f"--pick out of range (0..{len(matches)-1})")
-    return matches[pick]
+    raise SystemExit(f"--pick out of range (0..{len(matches)-1})")
+
+
+def dump(
+    vid: Optional[int] = None,
+    pid: Optional[int] = None,
+    pick: int = 0,
+    configure: bool = False,
+    verbose: bool = False,
+) -> dict:
+    """
+    Enumerate the camera and return the report as a dict. This is the
+    in-process entry point: callers that already run Python (e.g. a flashing
+    or provisioning script) get the values directly instead of spawning this
+    script and re-parsing its stdout.
+    """
+    dev, cfg_value, ifnum, intf = find_ptp_device(vid, pid, pick, verbose=verbose)
+
+    langid = get_langid(dev)
+
+    # Endpoint details come straight from the descriptor tree; configuring the
+    # device is not required to read them. SET_CONFIGURATION acts as a light
+    # device reset (endpoint halts cleared, toggles reset) and costs hundreds
+    # of ms on some cameras, so it is opt-in and skipped when already active.
+    if configure:
+        try:
+            active = dev.get_active_configuration().bConfigurationValue
+        except usb.core.USBError:
+            active = None  # "Configuration not set"
+        if active != cfg_value:
+            dev.set_configuration(cfg_value)
+
+    # Classify endpoints with pyusb's descriptor walk and the canonical
+    # endpoint_type/endpoint_direction helpers instead of hand-masking
+    # bmAttributes per endpoint in Python.
+    bulk_in = [
+        (ep.bEndpointAddress, ep.wMaxPacketSize)
+        for ep in usb.util.find_descriptor(
+            intf,
+            find_all=True,
+            custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_IN
+            and usb.util.endpoint_type(e.bmAttributes) == usb.util.ENDPOINT_TYPE_BULK,
+        )
+    ]
+    bulk_out = [
+        (ep.bEndpointAddress, ep.wMaxPacketSize)
+        for ep in usb.util.find_descriptor(
+            intf,
+            find_all=True,
+            custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_OUT
+            and usb.util.endpoint_type(e.bmAttributes) == usb.util.ENDPOINT_TYPE_BULK,
+        )
+    ]
+
+    return {
+        "vid": dev.idVendor,
+        "pid": dev.idProduct,
+        "bcdDevice": dev.bcdDevice,
+        "manufacturer": get_str(dev, dev.iManufacturer, langid),
+        "product": get_str(dev, dev.iProduct, langid),
+        "serial": get_str(dev, dev.iSerialNumber, langid),
+        "interface": ifnum,
+        "bulk_in": bulk_in,
+        "bulk_out": bulk_out,
+    }
+
+
+# Reports from earlier runs, one entry per (vid, pid, serial). Descriptors
+# never change between plugs of the same camera, so a cache hit answers
+# without touching USB at all (useful when the camera is currently claimed
+# by the firmware under test).
+_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ronin_ptp_dump.json")
+
+
+def _cache_load() -> list:
+    try:
+        with open(_CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    except (OSError, ValueError):
+        # Missing or corrupt cache is equivalent to an empty one.
+        return []
+
+
+def _cache_lookup(vid: Optional[int], pid: Optional[int]) -> Optional[dict]:
+    for rep in _cache_load():
+        if not isinstance(rep, dict):
+            continue
+        if vid is not None and rep.get("vid") != vid:
+            continue
+        if pid is not None and rep.get("pid") != pid:
+            continue
+        if "bulk_in" in rep and "bulk_out" in rep:
+            return rep
+    return None
+
+
+def _cache_store(rep: dict) -> None:
+    key = (rep["vid"], rep["pid"], rep["serial"])
+    entries = [
+        e for e in _cache_load()
+        if not (isinstance(e, dict) and (e.get("vid"), e.get("pid"), e.get("serial")) == key)
+    ]
+    entries.append(rep)
+    try:
+        os.makedirs(os.path.dirname(_CACHE_PATH), exist_ok=True)
+        with open(_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+    except OSError:
+        pass  # cache is best-effort; the live dump already succeeded
+
+
+def _format_report(rep: dict) -> str:
+    lines = [
+        f"Device: VID=0x{rep['vid']:04x} PID=0x{rep['pid']:04x}",
+        f"bcdDevice: 0x{rep['bcdDevice']:04x}",
+        f"iManufacturer: {rep['manufacturer']!r}",
+        f"iProduct     : {rep['product']!r}",
+        f"iSerialNumber: {rep['serial']!r}",
+        f"PTP interface number: {rep['interface']}",
+        "Bulk IN endpoints : " + (", ".join(f"0x{a:02x} wMaxPacketSize={mps}" for a, mps in rep["bulk_in"]) or "(none)"),
+        "Bulk OUT endpoints: " + (", ".join(f"0x{a:02x} wMaxPacketSize={mps}" for a, mps in rep["bulk_out"]) or "(none)"),
+    ]
+    return "\n".join(lines) + "\n"
 
 
-def main() -> int:
+def main(argv: Optional[list] = None) -> int:
     ap = argparse.ArgumentParser(description="Dump USB enumeration parameters from a PTP camera.")
-    ap.add_argument("--vid", type=lambda s: int(s, 0), default=None, help="Filter VID (e.g. 0x054c)")
-    ap.add_argument("--pid", type=lambda s: int(s, 0), default=None, help="Filter PID")
+    ap.add_argument("--vid", type=_hex, default=None, help="Filter VID (e.g. 0x054c)")
+    ap.add_argument("--pid", type=_hex, default=None, help="Filter PID")
     ap.add_argument("--pick", type=int, default=0, help="Pick Nth matching PTP interface")
-    args = ap.parse_args()
-
-    dev, cfg_value, ifnum = find_ptp_device(args.vid, args.pid, args.pick)
-
-    print(f"Device: VID=0x{int(dev.idVendor):04x} PID=0x{int(dev.idProduct):04x}")
-    print(f"bcdDevice: 0x{int(dev.bcdDevice):04x}")
-
-    m = get_str(dev, dev.iManufacturer)
-    p = get_str(dev, dev.iProduct)
-    s = get_str(dev, dev.iSerialNumber)
-    print(f"iManufacturer: {repr(m)}")
-    print(f"iProduct     : {repr(p)}")
-    print(f"iSerialNumber: {repr(s)}")
-
-    # Endpoint details on the PTP interface
-    dev.set_configuration(cfg_value)
-    cfg = dev.get_active_configuration()
-    intf = usb.util.find_descriptor(cfg, bInterfaceNumber=ifnum)
-    if intf is None:
-        print(f"PTP interface: {ifnum} (not found after set_configuration)")
-        return 0
-
-    bulk_in = []
-    bulk_out = []
-    for ep in intf:
-        addr = int(ep.bEndpointAddress)
-        attrs = int(ep.bmAttributes)
-        xfertype = attrs & 0x3
-        if xfertype != usb.util.ENDPOINT_TYPE_BULK:
-            continue
-        if usb.util.endpoint_direction(addr) == usb.util.ENDPOINT_IN:
-            bulk_in.append((addr, int(ep.wMaxPacketSize)))
-        else:
-            bulk_out.append((addr, int(ep.wMaxPacketSize)))
+    ap.add_argument("--configure", action="store_true",
+                    help="Issue SET_CONFIGURATION before dumping (not needed just to read descriptors).")
+    ap.add_argument("--verbose", action="store_true",
+                    help="Report devices skipped during the scan (permissions, USB errors).")
+    ap.add_argument("--refresh", action="store_true",
+                    help=f"Bypass the on-disk report cache ({_CACHE_PATH}) and rescan the bus.")
+    args = ap.parse_args(argv)
+
+    # Serve from the cache when a previously dumped device matches the
+    # filters. --configure always goes to hardware, and --pick indexes the
+    # live scan order that a per-device cache cannot reproduce.
+    if not args.refresh and not args.configure and args.pick == 0:
+        rep = _cache_lookup(args.vid, args.pid)
+        if rep is not None:
+            sys.stdout.write(_format_report(rep))
+            sys.stdout.flush()
+            return 0
+
+    rep = dump(vid=args.vid, pid=args.pid, pick=args.pick, configure=args.configure, verbose=args.verbose)
+    _cache_store(rep)
 
-    print(f"PTP interface number: {ifnum}")
-    print("Bulk IN endpoints :", ", ".join([f"0x{a:02x} wMaxPacketSize={mps}" for a, mps in bulk_in]) or "(none)")
-    print("Bulk OUT endpoints:", ", ".join([f"0x{a:02x} wMaxPacketSize={mps}" for a, mps in bulk_out]) or "(none)")
+    # Emit the report with one write: the output stays atomic (no
+    # interleaving when several dumps run concurrently) and a capture
+    # pipeline sees a single write instead of one per line.
+    sys.stdout.write(_format_report(rep))
+    sys.stdout.flush()
     return 0
 
 